@@ -0,0 +1,6 @@
+def close_inverse_transform(scaler, close_index=3):
+    """Return (scale, offset) mapping scaled Close values back to prices"""
+    # MinMaxScaler is affine per column (x_scaled = x * scale_ + min_), so no
+    # full feature matrix is needed for inverse_transform
+    scale = 1.0 / float(scaler.scale_[close_index])
+    return scale, -float(scaler.min_[close_index]) * scale
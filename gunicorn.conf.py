@@ -0,0 +1,23 @@
+import os
+
+bind = os.environ.get('ML_API_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('ML_API_WORKERS', 2))
+threads = int(os.environ.get('ML_API_THREADS', 4))
+
+# Load and warm the models once in the master; workers share them copy-on-write
+preload_app = True
+
+# Each worker has private caches; POST /cache/flush reaches them all by
+# touching the CACHE_FLUSH_STAMP file, which workers check before each predict
+
+# Workers that recreate their sessions after fork need time to warm them up
+timeout = 120
+
+
+def post_fork(server, worker):
+    # With the default single intra-op thread ONNX Runtime starts no pool
+    # threads, so preloaded sessions are fork-safe. Larger pools are threads of
+    # the master and don't exist in the child, so recreate the sessions there
+    if int(os.environ.get('ORT_INTRA_OP_THREADS', 1)) > 1:
+        from predict_api import prediction_service
+        prediction_service.load_models()
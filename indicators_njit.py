@@ -0,0 +1,187 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from _njit import njit, HAVE_NUMBA
+
+# Rolling windows are NaN until full. NaNs in the input are counted rather than
+# summed, so like pandas only windows that contain a NaN are NaN
+
+# fastmath without 'nnan'/'ninf': the leading NaNs and zero-loss RSI rely on IEEE semantics
+_FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _rolling_mean(x, window):
+    """Rolling mean with a running sum"""
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    total = 0.0
+    nan_count = 0
+    for i in range(n):
+        if np.isnan(x[i]):
+            nan_count += 1
+        else:
+            total += x[i]
+        if i >= window:
+            if np.isnan(x[i - window]):
+                nan_count -= 1
+            else:
+                total -= x[i - window]
+        if i >= window - 1 and nan_count == 0:
+            out[i] = total / window
+    return out
+
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _rolling_std(x, window):
+    """Rolling sample std using Welford add/remove updates"""
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    count = 0
+    nan_count = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(n):
+        if np.isnan(x[i]):
+            nan_count += 1
+        else:
+            count += 1
+            delta = x[i] - mean
+            mean += delta / count
+            m2 += delta * (x[i] - mean)
+        if i >= window:
+            old = x[i - window]
+            if np.isnan(old):
+                nan_count -= 1
+            elif count == 1:
+                count = 0
+                mean = 0.0
+                m2 = 0.0
+            else:
+                count -= 1
+                delta = old - mean
+                mean -= delta / count
+                m2 -= delta * (old - mean)
+        if i >= window - 1 and nan_count == 0:
+            out[i] = np.sqrt(max(m2, 0.0) / (count - 1))
+    return out
+
+
+@njit(cache=True, fastmath=_FASTMATH)
+def _indicators_njit(close, high, low, volume):
+    """Compute the INDICATOR_COLUMNS arrays from float64 OHLCV arrays"""
+    n = close.shape[0]
+
+    # Moving averages
+    ma_7 = _rolling_mean(close, 7)
+    ma_21 = _rolling_mean(close, 21)
+    ma_50 = _rolling_mean(close, 50)
+
+    # RSI (the first diff, and diffs touching a NaN, count as zero gain/loss,
+    # like delta.where(...))
+    gain = np.zeros(n)
+    loss = np.zeros(n)
+    # Price change over forward-filled closes, like pct_change(fill_method='pad')
+    price_change = np.full(n, np.nan)
+    last_close = close[0]
+    for i in range(1, n):
+        delta = close[i] - close[i - 1]
+        if delta > 0:
+            gain[i] = delta
+        elif delta < 0:
+            loss[i] = -delta
+        filled = last_close if np.isnan(close[i]) else close[i]
+        price_change[i] = filled / last_close - 1
+        last_close = filled
+    avg_gain = _rolling_mean(gain, 14)
+    avg_loss = _rolling_mean(loss, 14)
+    rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+
+    # Bollinger Bands
+    bb_middle = _rolling_mean(close, 20)
+    bb_std = _rolling_std(close, 20)
+    bb_upper = bb_middle + bb_std * 2
+    bb_lower = bb_middle - bb_std * 2
+    bb_position = (close - bb_lower) / (bb_upper - bb_lower)
+
+    # Volatility
+    volatility = _rolling_std(close, 10)
+
+    # Volume indicators
+    volume_ma = _rolling_mean(volume, 10)
+    volume_ratio = volume / volume_ma
+
+    # Price change indicators
+    high_low_ratio = high / low
+
+    return (ma_7, ma_21, ma_50, rsi, bb_position, volatility,
+            volume_ratio, price_change, high_low_ratio)
+
+
+def _rolling_mean_cumsum(x, window):
+    """Rolling mean as a difference of cumulative sums"""
+    out = np.full(x.shape[0], np.nan)
+    if x.shape[0] >= window:
+        missing = np.isnan(x)
+        c = np.cumsum(np.insert(np.where(missing, 0.0, x), 0, 0.0))
+        nans = np.cumsum(np.insert(missing, 0, False))
+        means = (c[window:] - c[:-window]) / window
+        out[window - 1:] = np.where(nans[window:] - nans[:-window] == 0, means, np.nan)
+    return out
+
+
+def _rolling_std_windows(x, window):
+    """Rolling sample std over strided windows"""
+    out = np.full(x.shape[0], np.nan)
+    if x.shape[0] >= window:
+        out[window - 1:] = sliding_window_view(x, window).std(axis=1, ddof=1)
+    return out
+
+
+def _indicators_numpy(close, high, low, volume):
+    """Vectorized NumPy equivalent of _indicators_njit, used when numba is absent"""
+    # RSI (the first diff, and diffs touching a NaN, are zero, like delta.where(...))
+    delta = np.diff(close, prepend=close[:1])
+    avg_gain = _rolling_mean_cumsum(np.where(delta > 0, delta, 0.0), 14)
+    avg_loss = _rolling_mean_cumsum(np.where(delta < 0, -delta, 0.0), 14)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+
+        # Bollinger Bands
+        bb_middle = _rolling_mean_cumsum(close, 20)
+        bb_std = _rolling_std_windows(close, 20)
+        bb_position = (close - (bb_middle - bb_std * 2)) / (bb_std * 4)
+
+        # Volume indicators
+        volume_ratio = volume / _rolling_mean_cumsum(volume, 10)
+
+    # Price change over forward-filled closes, like pct_change(fill_method='pad')
+    valid = np.where(np.isnan(close), 0, np.arange(close.shape[0]))
+    filled = close[np.maximum.accumulate(valid)]
+    price_change = np.full(close.shape[0], np.nan)
+    price_change[1:] = filled[1:] / filled[:-1] - 1
+
+    return (_rolling_mean_cumsum(close, 7), _rolling_mean_cumsum(close, 21),
+            _rolling_mean_cumsum(close, 50), rsi, bb_position,
+            _rolling_std_windows(close, 10), volume_ratio, price_change, high / low)
+
+
+INDICATOR_COLUMNS = ['MA_7', 'MA_21', 'MA_50', 'RSI', 'BB_position', 'Volatility',
+                     'Volume_ratio', 'Price_change', 'High_low_ratio']
+
+
+def compute_indicators(df):
+    """Return {column: array} of technical indicators for an OHLCV DataFrame"""
+    # Failed yfinance fetches come back empty; both kernels read close[0]
+    if len(df) == 0:
+        return {column: np.empty(0) for column in INDICATOR_COLUMNS}
+
+    # Without numba the njit kernel would run as plain Python loops
+    kernel = _indicators_njit if HAVE_NUMBA else _indicators_numpy
+    arrays = kernel(
+        df['Close'].to_numpy(dtype=np.float64),
+        df['High'].to_numpy(dtype=np.float64),
+        df['Low'].to_numpy(dtype=np.float64),
+        df['Volume'].to_numpy(dtype=np.float64)
+    )
+    return dict(zip(INDICATOR_COLUMNS, arrays))
@@ -1,15 +1,49 @@
 from flask import Flask, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import tensorflow as tf
+import orjson
+import onnxruntime as ort
 import joblib
 import numpy as np
 import yfinance as yf
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
+import hmac
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cachetools import TTLCache
+from indicators_njit import compute_indicators
+from close_scaling import close_inverse_transform
+
+# Serve the int8-quantized models when available
+USE_INT8 = os.environ.get('USE_INT8') == '1'
+
+# Touched by /cache/flush; every worker process drops its caches when it changes.
+# Kept next to this deployment's models so other apps on the host don't share it
+CACHE_FLUSH_STAMP = os.environ.get('CACHE_FLUSH_STAMP', 'models/.cache_flush')
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, which serializes numpy values natively"""
+    
+    def dumps(self, obj, **kwargs):
+        # Unlike the default provider, non-ASCII text is written as raw UTF-8,
+        # datetimes as RFC 3339 and NaN as null
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        # Keep Flask's default of sorted keys
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app)
 
 class PredictionService:
@@ -22,56 +56,110 @@ class PredictionService:
         }
         self.models = {}
         self.scalers = {}
+        self.close_scale = {}
         self.sequence_length = 60
+        self.feature_columns = ['Open', 'High', 'Low', 'Close', 'Volume',
+                                'MA_7', 'MA_21', 'MA_50', 'RSI', 'BB_position',
+                                'Volatility', 'Volume_ratio', 'Price_change', 'High_low_ratio']
+        # Market data is cached per (symbol, period) and full results per (symbol, days)
+        self._data_cache = TTLCache(maxsize=32, ttl=300)
+        self._result_cache = TTLCache(maxsize=128, ttl=60)
+        self._cache_lock = threading.Lock()
+        # Bumped by every flush; calls that started earlier don't store their results
+        self._cache_generation = 0
+        self._flush_seen = self.flush_stamp()
+        # Batch requests predict symbols concurrently; yfinance I/O releases the GIL
+        self._batch_pool = ThreadPoolExecutor(max_workers=len(self.crypto_symbols))
+        # Preallocated model input/output per symbol, bound to the session once
+        # and reused across requests
+        self._input_buffers = {}
+        self._io_bindings = {}
+        self._input_locks = {}
         self.load_models()
     
+    def session_options(self):
+        """ONNX Runtime options tuned for single-sample requests on shared CPUs"""
+        so = ort.SessionOptions()
+        # Small per-session pools so concurrent requests don't oversubscribe the CPU
+        so.intra_op_num_threads = int(os.environ.get('ORT_INTRA_OP_THREADS', 1))
+        so.inter_op_num_threads = 1
+        so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # No spin-waiting between requests
+        so.add_session_config_entry('session.intra_op.allow_spinning', '0')
+        return so
+    
     def load_models(self):
         """Load all trained models and scalers"""
+        so = self.session_options()
+        warm_up_time = 0.0
         for symbol in self.crypto_symbols.keys():
             model_dir = f"models/{symbol.replace('-', '_')}"
+            model_path = f"{model_dir}/model.onnx"
+            if USE_INT8 and os.path.exists(f"{model_dir}/model.int8.onnx"):
+                model_path = f"{model_dir}/model.int8.onnx"
             try:
-                if os.path.exists(f"{model_dir}/model.h5"):
-                    self.models[symbol] = tf.keras.models.load_model(f"{model_dir}/model.h5")
-                    self.scalers[symbol] = joblib.load(f"{model_dir}/scaler.pkl")
-                    print(f"✅ Loaded model for {symbol}")
+                if os.path.exists(model_path):
+                    session = ort.InferenceSession(
+                        model_path, sess_options=so, providers=['CPUExecutionProvider']
+                    )
+                    scaler = joblib.load(f"{model_dir}/scaler.pkl")
+                    n_features = len(scaler.scale_)
+                    input_buffer = np.zeros((1, self.sequence_length, n_features), dtype=np.float32)
+                    io_binding = self.bind_io(session, input_buffer)
+                    warm_up_time += self.warm_up(session, io_binding[0])
+                    
+                    # Register the symbol only once everything above succeeded
+                    self.models[symbol] = session
+                    self.scalers[symbol] = scaler
+                    self.close_scale[symbol] = close_inverse_transform(scaler)
+                    self._input_buffers[symbol] = input_buffer
+                    self._io_bindings[symbol] = io_binding
+                    self._input_locks[symbol] = threading.Lock()
+                    print(f"✅ Loaded model for {symbol} ({os.path.basename(model_path)})")
                 else:
                     print(f"⚠️  No model found for {symbol}")
             except Exception as e:
                 print(f"❌ Error loading model for {symbol}: {e}")
+        
+        if self.models:
+            warm_up_time += self.warm_up_indicators()
+            print(f"🔥 Warmed up {len(self.models)} models in {warm_up_time:.2f}s")
+    
+    def bind_io(self, session, input_buffer):
+        """Bind a session's input and output to preallocated numpy buffers"""
+        # CPU OrtValues wrap the numpy memory without copying, so edits to
+        # input_buffer feed the next run and each run writes into output_buffer
+        output_buffer = np.zeros((1, 1), dtype=np.float32)
+        input_value = ort.OrtValue.ortvalue_from_numpy(input_buffer)
+        output_value = ort.OrtValue.ortvalue_from_numpy(output_buffer)
+        
+        binding = session.io_binding()
+        binding.bind_ortvalue_input('seq', input_value)
+        binding.bind_ortvalue_output(session.get_outputs()[0].name, output_value)
+        # The OrtValues must outlive the binding
+        return binding, output_buffer, (input_value, output_value)
+    
+    def warm_up(self, session, binding):
+        """Run one dummy inference so the first request skips start-up costs; returns its time"""
+        # The bound input buffer is still zero-filled here
+        start = time.perf_counter()
+        session.run_with_iobinding(binding)
+        return time.perf_counter() - start
+    
+    def warm_up_indicators(self):
+        """Compile the indicator kernels on a dummy frame; returns the time taken"""
+        # Runs before gunicorn forks, so workers inherit the compiled numba kernels
+        start = time.perf_counter()
+        prices = np.linspace(1.0, 2.0, self.sequence_length)
+        compute_indicators(pd.DataFrame({
+            'Open': prices, 'High': prices, 'Low': prices, 'Close': prices, 'Volume': prices
+        }))
+        return time.perf_counter() - start
     
     def prepare_features(self, data):
         """Add technical indicators as features"""
-        df = data.copy()
-        
-        # Moving averages
-        df['MA_7'] = df['Close'].rolling(window=7).mean()
-        df['MA_21'] = df['Close'].rolling(window=21).mean()
-        df['MA_50'] = df['Close'].rolling(window=50).mean()
-        
-        # RSI
-        delta = df['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
-        
-        # Bollinger Bands
-        df['BB_middle'] = df['Close'].rolling(window=20).mean()
-        bb_std = df['Close'].rolling(window=20).std()
-        df['BB_upper'] = df['BB_middle'] + (bb_std * 2)
-        df['BB_lower'] = df['BB_middle'] - (bb_std * 2)
-        df['BB_position'] = (df['Close'] - df['BB_lower']) / (df['BB_upper'] - df['BB_lower'])
-        
-        # Volatility
-        df['Volatility'] = df['Close'].rolling(window=10).std()
-        
-        # Volume indicators
-        df['Volume_MA'] = df['Volume'].rolling(window=10).mean()
-        df['Volume_ratio'] = df['Volume'] / df['Volume_MA']
-        
-        # Price change indicators
-        df['Price_change'] = df['Close'].pct_change()
-        df['High_low_ratio'] = df['High'] / df['Low']
+        df = data.assign(**compute_indicators(data))
         
         # Drop rows with NaN values
         df = df.dropna()
@@ -79,80 +167,136 @@ class PredictionService:
         return df
     
     def fetch_crypto_data(self, symbol, period="1y"):
-        """Fetch historical crypto data"""
+        """Fetch historical crypto data, reusing fetches from the last 5 minutes"""
+        key = (symbol, period)
+        with self._cache_lock:
+            data = self._data_cache.get(key)
+            generation = self._cache_generation
+        if data is not None:
+            return data
+        
         try:
             ticker = yf.Ticker(symbol)
             data = ticker.history(period=period)
-            return data
         except Exception as e:
             print(f"Error fetching data for {symbol}: {e}")
             return None
+        
+        # yfinance returns an empty frame instead of raising on failed fetches;
+        # leave those uncached so the next request retries
+        if data is not None and not data.empty:
+            with self._cache_lock:
+                if self._cache_generation == generation:
+                    self._data_cache[key] = data
+        return data
+    
+    def flush_stamp(self):
+        """Modification time of the shared flush stamp, or None before any flush"""
+        try:
+            return os.stat(CACHE_FLUSH_STAMP).st_mtime_ns
+        except OSError:
+            return None
+    
+    def clear_caches(self):
+        """Drop this process's cached market data and predictions"""
+        with self._cache_lock:
+            self._data_cache.clear()
+            self._result_cache.clear()
+            self._cache_generation += 1
+    
+    def flush_caches(self):
+        """Drop cached data in every worker process"""
+        # Caches are per worker; the others see the new stamp in sync_flushes
+        with open(CACHE_FLUSH_STAMP, 'a'):
+            os.utime(CACHE_FLUSH_STAMP)
+        self._flush_seen = self.flush_stamp()
+        self.clear_caches()
+    
+    def sync_flushes(self):
+        """Clear the local caches if another worker flushed since we last looked"""
+        stamp = self.flush_stamp()
+        if stamp != self._flush_seen:
+            self._flush_seen = stamp
+            self.clear_caches()
+    
+    def scale_features(self, symbol, data_with_features):
+        """Scale the model's input window"""
+        # Only the window feeds the model; indicators already used the full history
+        tail = data_with_features.iloc[-self.sequence_length:]
+        return self.scalers[symbol].transform(tail[self.feature_columns].to_numpy(dtype=np.float32))
+    
+    def _rollout(self, symbol, last_sequence, days):
+        """Predict `days` scaled close prices autoregressively from `last_sequence`"""
+        session = self.models[symbol]
+        binding, pred, _ = self._io_bindings[symbol]
+        predictions = np.empty(days, dtype=np.float32)
+        with self._input_locks[symbol]:
+            current_sequence = self._input_buffers[symbol]
+            current_sequence[0] = last_sequence
+            
+            for day in range(days):
+                # Reads the bound input buffer and writes into `pred` in place
+                session.run_with_iobinding(binding)
+                predictions[day] = pred[0, 0]
+                
+                # Update sequence (simplified): shift in place; the last row
+                # keeps its features with the close price replaced
+                current_sequence[0, :-1, :] = current_sequence[0, 1:, :]
+                current_sequence[0, -1, 3] = pred[0, 0]
+        return predictions
     
     def predict_prices(self, symbol, days=10):
         """Predict prices for next N days"""
         if symbol not in self.models:
             return None
         
-        model = self.models[symbol]
-        scaler = self.scalers[symbol]
+        self.sync_flushes()
+        key = (symbol, days)
+        with self._cache_lock:
+            cached = self._result_cache.get(key)
+            generation = self._cache_generation
+        if cached is not None:
+            return cached
         
         # Get recent data
         data = self.fetch_crypto_data(symbol, period="1y")
-        if data is None:
+        if data is None or data.empty:
             return None
             
         data_with_features = self.prepare_features(data)
+        if data_with_features.empty:
+            return None
         
         # Get last sequence
-        feature_columns = ['Open', 'High', 'Low', 'Close', 'Volume', 
-                          'MA_7', 'MA_21', 'MA_50', 'RSI', 'BB_position', 
-                          'Volatility', 'Volume_ratio', 'Price_change', 'High_low_ratio']
-        
-        scaled_data = scaler.transform(data_with_features[feature_columns])
-        last_sequence = scaled_data[-self.sequence_length:].reshape(1, self.sequence_length, -1)
+        last_sequence = self.scale_features(symbol, data_with_features)
         
         # Predict next days
-        predictions = []
-        current_sequence = last_sequence.copy()
-        
-        for _ in range(days):
-            pred = model.predict(current_sequence, verbose=0)
-            predictions.append(pred[0, 0])
-            
-            # Update sequence (simplified)
-            new_row = current_sequence[0, -1, :].copy()
-            new_row[3] = pred[0, 0]  # Update close price
-            
-            current_sequence = np.roll(current_sequence, -1, axis=1)
-            current_sequence[0, -1, :] = new_row
+        predictions = self._rollout(symbol, last_sequence, days)
         
-        # Inverse transform predictions
-        dummy_pred = np.zeros((len(predictions), len(scaler.scale_)))
-        for i, pred in enumerate(predictions):
-            dummy_pred[i, 3] = pred
-        
-        actual_predictions = scaler.inverse_transform(dummy_pred)[:, 3]
+        # Inverse transform predictions (MinMaxScaler is affine per column)
+        close_scale, close_offset = self.close_scale[symbol]
+        actual_predictions = predictions.astype(np.float64) * close_scale + close_offset
         
         # Create prediction dates
         last_date = data_with_features.index[-1]
-        pred_dates = [last_date + timedelta(days=i+1) for i in range(days)]
+        pred_dates = pd.date_range(last_date + pd.Timedelta(days=1), periods=days, freq='D')
         
         # Calculate trend and confidence
-        current_price = float(data_with_features['Close'].iloc[-1])
-        avg_prediction = float(np.mean(actual_predictions))
+        current_price = data_with_features['Close'].iloc[-1]
+        avg_prediction = np.mean(actual_predictions)
         trend = "bullish" if avg_prediction > current_price else "bearish"
         
         # Generate trading signals
         signals = self.generate_trading_signals(symbol, actual_predictions, current_price)
         
-        return {
+        result = {
             'symbol': symbol,
             'crypto_name': self.crypto_symbols[symbol],
             'current_price': current_price,
             'predictions': [
                 {
                     'date': date.strftime('%Y-%m-%d'),
-                    'price': float(price)
+                    'price': price
                 }
                 for date, price in zip(pred_dates, actual_predictions)
             ],
@@ -164,37 +308,59 @@ class PredictionService:
                 'avg_predicted_price': avg_prediction
             }
         }
+        
+        with self._cache_lock:
+            if self._cache_generation == generation:
+                self._result_cache[key] = result
+        return result
+    
+    def predict_many(self, symbols, days=10):
+        """Predict several symbols concurrently; returns {symbol: result}"""
+        futures = {
+            self._batch_pool.submit(self.predict_prices, symbol, days): symbol
+            for symbol in dict.fromkeys(symbols)
+        }
+        
+        results = {}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                results[futures[future]] = {'error': str(e)}
+        return results
     
     def generate_trading_signals(self, symbol, predictions, current_price):
         """Generate buy/sell signals based on predictions"""
-        signals = []
+        predictions = np.asarray(predictions, dtype=np.float64)
+        
+        # Day-over-day change, with day 1 measured against the current price
+        previous = np.concatenate(([current_price], predictions[:-1]))
+        change_pct = (predictions - previous) / previous * 100
         
         # Simple signal generation logic
-        for i, price in enumerate(predictions):
-            if i == 0:
-                change_pct = ((price - current_price) / current_price) * 100
-            else:
-                change_pct = ((price - predictions[i-1]) / predictions[i-1]) * 100
-            
-            if change_pct > 5:
-                signal = "strong_buy"
-            elif change_pct > 2:
-                signal = "buy"
-            elif change_pct < -5:
-                signal = "strong_sell"
-            elif change_pct < -2:
-                signal = "sell"
-            else:
-                signal = "hold"
-            
-            signals.append({
-                'day': i + 1,
-                'signal': signal,
-                'confidence': min(abs(change_pct) / 10, 1.0),  # Normalize confidence
-                'change_pct': round(change_pct, 2)
-            })
+        labels = np.array(['strong_sell', 'sell', 'hold', 'buy', 'strong_buy'])
+        signal_idx = np.select(
+            [change_pct > 5, change_pct > 2, change_pct < -5, change_pct < -2],
+            [4, 3, 0, 1],
+            default=2
+        )
+        confidence = np.clip(np.abs(change_pct) / 10, 0, 1.0)  # Normalize confidence
         
-        return signals
+        return [
+            {
+                'day': day,
+                'signal': signal,
+                'confidence': conf,
+                'change_pct': change
+            }
+            for day, signal, conf, change in zip(
+                range(1, len(predictions) + 1),
+                labels[signal_idx].tolist(),
+                confidence.tolist(),
+                # Python's round, not np.round: they disagree on halves like 2.675
+                [round(change, 2) for change in change_pct.tolist()]
+            )
+        ]
 
 # Initialize prediction service
 prediction_service = PredictionService()
@@ -260,21 +426,51 @@ def get_batch_predictions():
     
     results = {}
     
-    for symbol in symbols:
-        if symbol.upper() in [s.replace('-USD', '').upper() for s in prediction_service.crypto_symbols.keys()]:
-            yf_symbol = f"{symbol.upper()}-USD"
-            try:
-                result = prediction_service.predict_prices(yf_symbol, days)
-                if result:
-                    results[symbol] = result
-            except Exception as e:
-                results[symbol] = {'error': str(e)}
+    valid_symbols = [s.replace('-USD', '').upper() for s in prediction_service.crypto_symbols.keys()]
+    yf_symbols = {
+        symbol: f"{symbol.upper()}-USD"
+        for symbol in symbols
+        if symbol.upper() in valid_symbols
+    }
+    
+    # Symbols repeated in one batch (e.g. "btc" and "BTC") are only predicted once
+    computed = prediction_service.predict_many(yf_symbols.values(), days)
+    
+    for symbol, yf_symbol in yf_symbols.items():
+        if computed[yf_symbol]:
+            results[symbol] = computed[yf_symbol]
     
     return jsonify({
         'batch_predictions': results,
         'request_timestamp': datetime.now().isoformat()
     })
 
+@app.route('/cache/flush', methods=['POST'])
+def flush_cache():
+    """Invalidate cached market data and predictions in every worker"""
+    # Admin only: X-Admin-Token must match CACHE_FLUSH_TOKEN, or without a
+    # configured token the caller must be on loopback
+    token = os.environ.get('CACHE_FLUSH_TOKEN')
+    if token:
+        # compare_digest only accepts ASCII str, so compare the encoded bytes
+        allowed = hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), token.encode())
+    else:
+        allowed = request.remote_addr in ('127.0.0.1', '::1')
+    if not allowed:
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    try:
+        prediction_service.flush_caches()
+    except OSError as e:
+        return jsonify({
+            'error': 'Cache flush failed',
+            'message': str(e)
+        }), 500
+    return jsonify({
+        'status': 'flushed',
+        'timestamp': datetime.now().isoformat()
+    })
+
 @app.route('/available-symbols', methods=['GET'])
 def get_available_symbols():
     """Get list of available crypto symbols"""
@@ -317,7 +513,9 @@ if __name__ == '__main__':
     print("  GET  /health")
     print("  GET  /predictions/<symbol>?days=10")
     print("  POST /predictions/batch")
+    print("  POST /cache/flush")
     print("  GET  /available-symbols")
     print("  GET  /model-info/<symbol>")
     
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    # Development server only; use `gunicorn -c gunicorn.conf.py wsgi:app` in production
+    app.run(host='0.0.0.0', port=5001, debug=os.environ.get('FLASK_DEBUG') == '1')
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+
+from close_scaling import close_inverse_transform
+
+
+@pytest.mark.parametrize('feature_range', [(0, 1), (-1, 1), (0.1, 0.9)])
+@pytest.mark.parametrize('dtype, rtol', [(np.float64, 1e-12), (np.float32, 1e-6)])
+def test_matches_inverse_transform(feature_range, dtype, rtol):
+    rng = np.random.default_rng(0)
+    data = rng.uniform(1e3, 7e4, (200, 14)).astype(dtype)
+    scaler = MinMaxScaler(feature_range=feature_range).fit(data)
+    scaled = scaler.transform(data)
+
+    close_scale, close_offset = close_inverse_transform(scaler)
+
+    np.testing.assert_allclose(
+        scaled[:, 3].astype(np.float64) * close_scale + close_offset,
+        scaler.inverse_transform(scaled)[:, 3],
+        rtol=rtol
+    )
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators_njit import INDICATOR_COLUMNS, _indicators_njit, _indicators_numpy, compute_indicators
+
+
+def pandas_indicators(df):
+    """Reference: the pandas rolling implementation the kernels replace"""
+    df = df.copy()
+    df['MA_7'] = df['Close'].rolling(window=7).mean()
+    df['MA_21'] = df['Close'].rolling(window=21).mean()
+    df['MA_50'] = df['Close'].rolling(window=50).mean()
+
+    delta = df['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    df['RSI'] = 100 - (100 / (1 + gain / loss))
+
+    bb_middle = df['Close'].rolling(window=20).mean()
+    bb_std = df['Close'].rolling(window=20).std()
+    df['BB_position'] = (df['Close'] - (bb_middle - bb_std * 2)) / ((bb_middle + bb_std * 2) - (bb_middle - bb_std * 2))
+
+    df['Volatility'] = df['Close'].rolling(window=10).std()
+    df['Volume_ratio'] = df['Volume'] / df['Volume'].rolling(window=10).mean()
+    # pct_change's pinned (pandas 2.0) default pads NaNs before dividing
+    df['Price_change'] = df['Close'].ffill().pct_change()
+    df['High_low_ratio'] = df['High'] / df['Low']
+    return df.dropna()
+
+
+def make_ohlcv(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.cumprod(1 + rng.normal(0, 0.03, n))
+    return pd.DataFrame({
+        'Open': close,
+        'High': close * 1.02,
+        'Low': close * 0.98,
+        'Close': close,
+        'Volume': rng.uniform(1e9, 2e9, n)
+    }, index=pd.date_range('2023-01-01', periods=n, tz='UTC'))
+
+
+def with_gaps(df, column, rows):
+    df = df.copy()
+    df.iloc[rows, df.columns.get_loc(column)] = np.nan
+    return df
+
+
+CASES = {
+    'clean': make_ohlcv(),
+    'close_nan_mid_series': with_gaps(make_ohlcv(), 'Close', [100]),
+    'close_nan_runs': with_gaps(make_ohlcv(), 'Close', [5, 150, 151, 152, 300]),
+    'volume_nan': with_gaps(make_ohlcv(), 'Volume', [200]),
+}
+
+
+@pytest.mark.parametrize('kernel', [_indicators_njit, _indicators_numpy])
+@pytest.mark.parametrize('case', list(CASES))
+def test_indicators_match_pandas(kernel, case):
+    df = CASES[case]
+    expected = pandas_indicators(df)
+
+    arrays = kernel(*(df[c].to_numpy(dtype=np.float64) for c in ['Close', 'High', 'Low', 'Volume']))
+    actual = df.assign(**dict(zip(INDICATOR_COLUMNS, arrays))).dropna()
+
+    assert actual.index.equals(expected.index)
+    for column in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(actual[column], expected[column], rtol=1e-8, err_msg=column)
+
+
+def test_mid_series_nan_only_drops_affected_windows():
+    df = CASES['close_nan_mid_series']
+    arrays = _indicators_njit(*(df[c].to_numpy(dtype=np.float64) for c in ['Close', 'High', 'Low', 'Volume']))
+    kept = df.assign(**dict(zip(INDICATOR_COLUMNS, arrays))).dropna()
+
+    # Rows 0-48 lack a full MA_50 window and rows 100-149 contain the gap
+    assert len(kept) == len(df) - 49 - 50
+
+
+def test_empty_frame():
+    df = make_ohlcv().iloc[:0]
+    indicators = compute_indicators(df)
+
+    assert list(indicators) == INDICATOR_COLUMNS
+    assert df.assign(**indicators).dropna().empty
+
+
+def test_numpy_kernel_empty_input():
+    empty = np.empty(0)
+    arrays = _indicators_numpy(empty, empty, empty, empty)
+
+    assert [len(a) for a in arrays] == [0] * len(INDICATOR_COLUMNS)
@@ -0,0 +1,352 @@
+import json
+import os
+import threading
+
+import numpy as np
+import onnxruntime as ort
+import pandas as pd
+import pytest
+from flask.json.provider import DefaultJSONProvider
+from onnx import TensorProto, helper
+from sklearn.preprocessing import MinMaxScaler
+
+import predict_api
+from predict_api import PredictionService, app, prediction_service
+
+
+def loop_signals(predictions, current_price):
+    """Reference: the per-day if/elif loop generate_trading_signals replaces"""
+    signals = []
+    for i, price in enumerate(predictions):
+        if i == 0:
+            change_pct = ((price - current_price) / current_price) * 100
+        else:
+            change_pct = ((price - predictions[i-1]) / predictions[i-1]) * 100
+
+        if change_pct > 5:
+            signal = "strong_buy"
+        elif change_pct > 2:
+            signal = "buy"
+        elif change_pct < -5:
+            signal = "strong_sell"
+        elif change_pct < -2:
+            signal = "sell"
+        else:
+            signal = "hold"
+
+        signals.append({
+            'day': i + 1,
+            'signal': signal,
+            'confidence': min(abs(change_pct) / 10, 1.0),
+            'change_pct': round(change_pct, 2)
+        })
+    return signals
+
+
+SIGNAL_CASES = {
+    # Exactly on each threshold, then just past it
+    'plus_5': [105.0],
+    'minus_5': [95.0],
+    'plus_2': [102.0],
+    'minus_2': [98.0],
+    'past_thresholds': [105.01, 94.99, 102.01, 97.99],
+    'nan': [101.0, np.nan, 99.0],
+    # Day 2 changes by exactly 2.675, which np.round takes to 2.68 and round to 2.67
+    'round_half': [1000.0, 1026.75],
+    'random_walk': list(100 * np.cumprod(1 + np.random.default_rng(0).normal(0, 0.04, 30))),
+}
+
+
+@pytest.mark.parametrize('case', list(SIGNAL_CASES))
+def test_signals_match_loop(case):
+    predictions = SIGNAL_CASES[case]
+    expected = loop_signals(predictions, 100.0)
+    actual = prediction_service.generate_trading_signals('BTC-USD', np.array(predictions), 100.0)
+
+    assert [s['day'] for s in actual] == [s['day'] for s in expected]
+    assert [s['signal'] for s in actual] == [s['signal'] for s in expected]
+    for key in ('confidence', 'change_pct'):
+        np.testing.assert_array_equal([s[key] for s in actual], [s[key] for s in expected], err_msg=key)
+
+
+@pytest.mark.parametrize('price, change_pct, signal', [
+    (105.0, 5.0, 'buy'),
+    (95.0, -5.0, 'sell'),
+    (102.0, 2.0, 'hold'),
+    (98.0, -2.0, 'hold'),
+])
+def test_thresholds_are_exclusive(price, change_pct, signal):
+    day = prediction_service.generate_trading_signals('BTC-USD', np.array([price]), 100.0)[0]
+    assert day['change_pct'] == change_pct
+    assert day['signal'] == signal
+
+
+def mean_close_session(sequence_length, n_features):
+    """Stand-in for the LSTM: predicts the mean Close of the input window"""
+    graph = helper.make_graph(
+        [
+            helper.make_node('Gather', ['seq', 'close_index'], ['close'], axis=2),
+            helper.make_node('ReduceMean', ['close'], ['pred'], axes=[1], keepdims=1),
+        ],
+        'mean_close',
+        [helper.make_tensor_value_info('seq', TensorProto.FLOAT, [1, sequence_length, n_features])],
+        [helper.make_tensor_value_info('pred', TensorProto.FLOAT, [1, 1])],
+        [helper.make_tensor('close_index', TensorProto.INT64, [], [3])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    # Stay within the IR version the pinned onnxruntime reads
+    model.ir_version = 8
+    return ort.InferenceSession(model.SerializeToString(), providers=['CPUExecutionProvider'])
+
+
+def loop_rollout(session, last_sequence, days):
+    """Reference: the per-day session.run and np.roll loop _rollout replaces"""
+    predictions = []
+    current_sequence = last_sequence[None].copy()
+    for _ in range(days):
+        pred = session.run(None, {'seq': current_sequence})[0]
+        predictions.append(pred[0, 0])
+
+        new_row = current_sequence[0, -1, :].copy()
+        new_row[3] = pred[0, 0]
+
+        current_sequence = np.roll(current_sequence, -1, axis=1)
+        current_sequence[0, -1, :] = new_row
+    return np.array(predictions, dtype=np.float32)
+
+
+@pytest.mark.parametrize('days', [1, 30])
+def test_rollout_matches_loop(days):
+    sequence_length = prediction_service.sequence_length
+    n_features = len(prediction_service.feature_columns)
+    session = mean_close_session(sequence_length, n_features)
+
+    service = PredictionService.__new__(PredictionService)
+    input_buffer = np.zeros((1, sequence_length, n_features), dtype=np.float32)
+    service.models = {'BTC-USD': session}
+    service._input_buffers = {'BTC-USD': input_buffer}
+    service._io_bindings = {'BTC-USD': service.bind_io(session, input_buffer)}
+    service._input_locks = {'BTC-USD': threading.Lock()}
+
+    rng = np.random.default_rng(0)
+    for _ in range(2):
+        # A second call must start from its own sequence, not the last one's leftovers
+        last_sequence = rng.uniform(0, 1, (sequence_length, n_features)).astype(np.float32)
+        expected = loop_rollout(session, last_sequence, days)
+        actual = service._rollout('BTC-USD', last_sequence, days)
+
+        np.testing.assert_array_equal(actual, expected)
+        # Each day must feed the next, not repeat day 1
+        if days > 1:
+            assert len(np.unique(actual)) > 1
+
+
+def prediction_payload():
+    """predict_prices-shaped result, carrying the numpy scalars it really returns"""
+    prices = np.array([43210.123456, 43555.5, 42999.987654])
+    return {
+        'symbol': 'BTC-USD',
+        'crypto_name': 'Bitcoin',
+        'current_price': np.float64(43000.25),
+        'predictions': [
+            {'date': f'2024-01-0{day}', 'price': price}
+            for day, price in enumerate(prices, start=1)
+        ],
+        'trend': 'bullish',
+        'signals': prediction_service.generate_trading_signals('BTC-USD', prices, 43000.25),
+        'metadata': {
+            'prediction_date': '2024-01-01T00:00:00.000000',
+            'days_ahead': 3,
+            'avg_predicted_price': np.mean(prices)
+        }
+    }
+
+
+@pytest.mark.parametrize('debug', [False, True])
+def test_orjson_provider_matches_default(monkeypatch, debug):
+    # Debug mode switches both providers to indented output
+    monkeypatch.setattr(app, 'debug', debug)
+    payload = prediction_payload()
+
+    expected = DefaultJSONProvider(app).response(payload).get_data()
+    assert app.json.response(payload).get_data() == expected
+
+
+def test_orjson_provider_writes_raw_utf8():
+    payload = {'crypto_name': 'Ðogecoin'}
+    ours = app.json.response(payload).get_data()
+    default = DefaultJSONProvider(app).response(payload).get_data()
+
+    # The default provider escapes non-ASCII; both decode to the same value
+    assert ours != default
+    assert app.json.loads(ours) == json.loads(default)
+
+
+def make_history(n=200, seed=0):
+    """Synthetic daily OHLCV frame shaped like a yfinance history"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.02, n))
+    return pd.DataFrame({
+        'Open': close,
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Close': close,
+        'Volume': rng.uniform(1e6, 2e6, n)
+    }, index=pd.date_range('2024-01-01', periods=n, tz='UTC'))
+
+
+class StubYahoo:
+    """Stand-in for yf.Ticker that serves a fixed history and counts fetches"""
+
+    def __init__(self, history):
+        self.history_frame = history
+        self.fetches = 0
+
+    def Ticker(self, symbol):
+        return self
+
+    def history(self, period):
+        self.fetches += 1
+        return self.history_frame
+
+
+@pytest.fixture
+def yahoo(monkeypatch):
+    stub = StubYahoo(make_history())
+    monkeypatch.setattr(predict_api.yf, 'Ticker', stub.Ticker)
+    return stub
+
+
+def make_service(history):
+    """PredictionService serving BTC-USD with the mean-Close stand-in model"""
+    service = PredictionService()
+    sequence_length = service.sequence_length
+    n_features = len(service.feature_columns)
+    session = mean_close_session(sequence_length, n_features)
+    features = service.prepare_features(history)[service.feature_columns]
+    scaler = MinMaxScaler().fit(features.to_numpy(dtype=np.float32))
+
+    input_buffer = np.zeros((1, sequence_length, n_features), dtype=np.float32)
+    service.models['BTC-USD'] = session
+    service.scalers['BTC-USD'] = scaler
+    service.close_scale['BTC-USD'] = predict_api.close_inverse_transform(scaler)
+    service._input_buffers['BTC-USD'] = input_buffer
+    service._io_bindings['BTC-USD'] = service.bind_io(session, input_buffer)
+    service._input_locks['BTC-USD'] = threading.Lock()
+    return service
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path, yahoo):
+    monkeypatch.setattr(predict_api, 'CACHE_FLUSH_STAMP', str(tmp_path / 'cache_flush'))
+    monkeypatch.setattr(PredictionService, 'load_models', lambda self: None)
+    service = make_service(yahoo.history_frame)
+    monkeypatch.setattr(predict_api, 'prediction_service', service)
+    return service
+
+
+@pytest.mark.parametrize('token, headers, remote_addr, status', [
+    ('secret', {'X-Admin-Token': 'secret'}, '10.0.0.5', 200),
+    ('secret', {'X-Admin-Token': 'wrong'}, '10.0.0.5', 403),
+    # With a token configured, loopback callers need it too
+    ('secret', {}, '127.0.0.1', 403),
+    (None, {}, '127.0.0.1', 200),
+    (None, {}, '::1', 200),
+    (None, {}, '10.0.0.5', 403),
+    (None, {'X-Admin-Token': 'anything'}, '10.0.0.5', 403),
+])
+def test_cache_flush_access(monkeypatch, service, token, headers, remote_addr, status):
+    if token is None:
+        monkeypatch.delenv('CACHE_FLUSH_TOKEN', raising=False)
+    else:
+        monkeypatch.setenv('CACHE_FLUSH_TOKEN', token)
+    service.predict_prices('BTC-USD', days=5)
+
+    response = app.test_client().post(
+        '/cache/flush', headers=headers, environ_base={'REMOTE_ADDR': remote_addr}
+    )
+
+    assert response.status_code == status
+    assert response.is_json
+    # Only an allowed flush drops the cached result
+    assert (len(service._result_cache) == 0) == (status == 200)
+
+
+def test_fetch_does_not_cache_empty_frames(service, yahoo):
+    yahoo.history_frame = yahoo.history_frame.iloc[:0]
+    assert service.fetch_crypto_data('BTC-USD').empty
+    assert service.fetch_crypto_data('BTC-USD').empty
+    assert yahoo.fetches == 2
+
+    yahoo.history_frame = make_history()
+    service.fetch_crypto_data('BTC-USD')
+    service.fetch_crypto_data('BTC-USD')
+    assert yahoo.fetches == 3
+
+
+def test_predict_prices_result_cache(service, yahoo):
+    result = service.predict_prices('BTC-USD', days=5)
+    assert len(result['predictions']) == 5
+
+    assert service.predict_prices('BTC-USD', days=5) is result
+    assert yahoo.fetches == 1
+
+    # Another horizon is a separate result but reuses the market data
+    assert len(service.predict_prices('BTC-USD', days=7)['predictions']) == 7
+    assert yahoo.fetches == 1
+
+
+def test_sync_flushes_follows_stamp(service):
+    service.predict_prices('BTC-USD', days=5)
+    service.sync_flushes()
+    assert len(service._result_cache) == 1
+
+    # Another worker touches the stamp
+    with open(predict_api.CACHE_FLUSH_STAMP, 'a'):
+        pass
+    service.sync_flushes()
+    assert len(service._result_cache) == 0
+    assert len(service._data_cache) == 0
+
+    service.predict_prices('BTC-USD', days=5)
+    stamp = os.stat(predict_api.CACHE_FLUSH_STAMP).st_mtime_ns
+    os.utime(predict_api.CACHE_FLUSH_STAMP, ns=(stamp + 10**9, stamp + 10**9))
+    service.sync_flushes()
+    assert len(service._result_cache) == 0
+
+
+def test_flush_during_predict_is_not_undone(monkeypatch, service, yahoo):
+    history = yahoo.history
+
+    def history_then_flush(period):
+        # The flush lands while this request is still fetching
+        frame = history(period)
+        service.flush_caches()
+        return frame
+
+    monkeypatch.setattr(yahoo, 'history', history_then_flush)
+    assert service.predict_prices('BTC-USD', days=5) is not None
+    assert len(service._data_cache) == 0
+    assert len(service._result_cache) == 0
+
+
+def test_flush_reaches_other_workers(service, yahoo):
+    # A second service stands in for another gunicorn worker sharing the stamp
+    other = make_service(yahoo.history_frame)
+    result = other.predict_prices('BTC-USD', days=5)
+    assert other.predict_prices('BTC-USD', days=5) is result
+    assert yahoo.fetches == 1
+
+    service.flush_caches()
+    assert other.predict_prices('BTC-USD', days=5) is not result
+    assert yahoo.fetches == 2
+
+
+def test_cache_flush_stamp_error_is_json(monkeypatch, tmp_path, service):
+    monkeypatch.delenv('CACHE_FLUSH_TOKEN', raising=False)
+    monkeypatch.setattr(predict_api, 'CACHE_FLUSH_STAMP', str(tmp_path / 'missing' / 'cache_flush'))
+
+    response = app.test_client().post('/cache/flush')
+
+    assert response.status_code == 500
+    assert response.get_json()['error'] == 'Cache flush failed'
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from rolling_predict import make_roll_predict
+
+
+def mean_close(window):
+    """Cheap stand-in for the model: the mean Close of the window, shape (1, 1)"""
+    return tf.reduce_mean(window[:, :, 3:4], axis=1)
+
+
+def loop_roll_predict(sequence, days):
+    """Reference: the per-day np.roll loop the compiled rollout replaces"""
+    predictions = []
+    current_sequence = sequence.copy()
+    for _ in range(days):
+        pred = current_sequence[:, :, 3:4].mean(axis=1, dtype=np.float32)
+        predictions.append(pred[0, 0])
+
+        new_row = current_sequence[0, -1, :].copy()
+        new_row[3] = pred[0, 0]
+
+        current_sequence = np.roll(current_sequence, -1, axis=1)
+        current_sequence[0, -1, :] = new_row
+    return np.array(predictions, dtype=np.float32)
+
+
+@pytest.mark.parametrize('days', [1, 2, 10, 59, 60, 61, 90])
+def test_matches_roll_loop(days):
+    sequence = np.random.default_rng(days).uniform(0, 1, (1, 60, 14)).astype(np.float32)
+    roll_predict = make_roll_predict(mean_close, days)
+
+    np.testing.assert_allclose(roll_predict(sequence).numpy(), loop_roll_predict(sequence, days), rtol=1e-5)
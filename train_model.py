@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import yfinance as yf
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.model_selection import train_test_split
@@ -7,18 +8,35 @@ from sklearn.metrics import mean_squared_error, mean_absolute_error
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout
+import tf2onnx
+import onnxruntime as ort
+from onnxruntime.quantization import quantize_dynamic, QuantType
 import matplotlib.pyplot as plt
 import seaborn as sns
 import joblib
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
+from indicators_njit import compute_indicators
+from close_scaling import close_inverse_transform
+from rolling_predict import make_roll_predict
+
+# Let XLA fuse the LSTM training step ops
+tf.config.optimizer.set_jit(True)
+
+# Train with 16-bit compute (fp16 on GPU, bf16 on CPU); variables stay float32
+tf.keras.mixed_precision.set_global_policy(
+    'mixed_float16' if tf.config.list_physical_devices('GPU') else 'mixed_bfloat16'
+)
 
 class CryptoPredictionModel:
     def __init__(self, sequence_length=60):
         self.sequence_length = sequence_length
         self.scaler = MinMaxScaler(feature_range=(0, 1))
         self.model = None
+        self.feature_columns = ['Open', 'High', 'Low', 'Close', 'Volume',
+                                'MA_7', 'MA_21', 'MA_50', 'RSI', 'BB_position',
+                                'Volatility', 'Volume_ratio', 'Price_change', 'High_low_ratio']
         self.crypto_symbols = {
             'BTC-USD': 'Bitcoin',
             'ETH-USD': 'Ethereum', 
@@ -38,37 +56,7 @@ class CryptoPredictionModel:
     
     def prepare_features(self, data):
         """Add technical indicators as features"""
-        df = data.copy()
-        
-        # Moving averages
-        df['MA_7'] = df['Close'].rolling(window=7).mean()
-        df['MA_21'] = df['Close'].rolling(window=21).mean()
-        df['MA_50'] = df['Close'].rolling(window=50).mean()
-        
-        # RSI
-        delta = df['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
-        
-        # Bollinger Bands
-        df['BB_middle'] = df['Close'].rolling(window=20).mean()
-        bb_std = df['Close'].rolling(window=20).std()
-        df['BB_upper'] = df['BB_middle'] + (bb_std * 2)
-        df['BB_lower'] = df['BB_middle'] - (bb_std * 2)
-        df['BB_position'] = (df['Close'] - df['BB_lower']) / (df['BB_upper'] - df['BB_lower'])
-        
-        # Volatility
-        df['Volatility'] = df['Close'].rolling(window=10).std()
-        
-        # Volume indicators
-        df['Volume_MA'] = df['Volume'].rolling(window=10).mean()
-        df['Volume_ratio'] = df['Volume'] / df['Volume_MA']
-        
-        # Price change indicators
-        df['Price_change'] = df['Close'].pct_change()
-        df['High_low_ratio'] = df['High'] / df['Low']
+        df = data.assign(**compute_indicators(data))
         
         # Drop rows with NaN values
         df = df.dropna()
@@ -77,20 +65,17 @@ class CryptoPredictionModel:
     
     def create_sequences(self, data, target_column='Close'):
         """Create sequences for LSTM training"""
-        feature_columns = ['Open', 'High', 'Low', 'Close', 'Volume', 
-                          'MA_7', 'MA_21', 'MA_50', 'RSI', 'BB_position', 
-                          'Volatility', 'Volume_ratio', 'Price_change', 'High_low_ratio']
-        
-        # Scale the features
-        scaled_data = self.scaler.fit_transform(data[feature_columns])
-        
-        X, y = [], []
-        for i in range(self.sequence_length, len(scaled_data)):
-            X.append(scaled_data[i-self.sequence_length:i])
-            # Predict next day's closing price (index 3 is Close price)
-            y.append(scaled_data[i, 3])
-            
-        return np.array(X), np.array(y)
+        # Scale the features (fit on a float32 ndarray so the scaler's constants,
+        # the sequences and the model inputs all stay float32)
+        scaled_data = self.scaler.fit_transform(data[self.feature_columns].to_numpy(dtype=np.float32))
+        
+        # Window i covers rows i..i+sequence_length-1; the last window has no next day
+        windows = sliding_window_view(scaled_data, (self.sequence_length, scaled_data.shape[1]))[:, 0]
+        X = np.ascontiguousarray(windows[:-1])
+        # Predict next day's closing price (index 3 is Close price)
+        y = scaled_data[self.sequence_length:, 3].copy()
+        
+        return X, y
     
     def build_model(self, input_shape):
         """Build LSTM model"""
@@ -102,12 +87,31 @@ class CryptoPredictionModel:
             LSTM(50, return_sequences=False),
             Dropout(0.2),
             Dense(25),
-            Dense(1)
+            # Keep the output (and so the loss) in float32 for numerical stability
+            Dense(1, dtype='float32')
         ])
         
         model.compile(optimizer='adam', loss='mse', metrics=['mae'])
         return model
     
+    def export_onnx(self, model, n_features, path):
+        """Export the model to ONNX for serving with ONNX Runtime"""
+        # ONNX Runtime's CPU kernels expect float32, so export a float32 copy
+        # of the (float32) trained weights rather than the mixed-precision graph
+        model_fp32 = tf.keras.models.clone_model(
+            model,
+            clone_function=lambda layer: layer.__class__.from_config({**layer.get_config(), 'dtype': 'float32'})
+        )
+        model_fp32.set_weights(model.get_weights())
+        
+        input_signature = [tf.TensorSpec((None, self.sequence_length, n_features), tf.float32, name='seq')]
+        tf2onnx.convert.from_keras(model_fp32, input_signature=input_signature, opset=17, output_path=path)
+    
+    def onnx_predict(self, path, X):
+        """Run an exported ONNX model over a batch of sequences with ONNX Runtime"""
+        session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+        return session.run(None, {'seq': X})[0].flatten()
+    
     def train_for_symbol(self, symbol):
         """Train model for a specific crypto symbol"""
         print(f"\n🚀 Training model for {self.crypto_symbols[symbol]}...")
@@ -139,57 +143,60 @@ class CryptoPredictionModel:
             monitor='val_loss', patience=10, restore_best_weights=True
         )
         
+        # Tensorize once and overlap batch preparation with training steps
+        ds_train = (tf.data.Dataset.from_tensor_slices((X_train, y_train))
+                    .cache().shuffle(4096).batch(32).prefetch(tf.data.AUTOTUNE))
+        ds_test = (tf.data.Dataset.from_tensor_slices((X_test, y_test))
+                   .batch(32).cache().prefetch(tf.data.AUTOTUNE))
+        
         history = model.fit(
-            X_train, y_train,
+            ds_train,
             epochs=50,
-            batch_size=32,
-            validation_data=(X_test, y_test),
+            validation_data=ds_test,
             callbacks=[early_stopping],
             verbose=1
         )
         
-        # Evaluate model
-        train_pred = model.predict(X_train)
-        test_pred = model.predict(X_test)
+        # Save model and scaler
+        model_dir = f"models/{symbol.replace('-', '_')}"
+        os.makedirs(model_dir, exist_ok=True)
         
-        # Inverse transform predictions (only for Close price column)
-        # Create dummy array with same shape as original features
-        dummy_train = np.zeros((len(train_pred), len(self.scaler.scale_)))
-        dummy_test = np.zeros((len(test_pred), len(self.scaler.scale_)))
+        model.save(f"{model_dir}/saved_model", save_format='tf')
+        self.export_onnx(model, X.shape[2], f"{model_dir}/model.onnx")
+        joblib.dump(self.scaler, f"{model_dir}/scaler.pkl")
         
-        dummy_train[:, 3] = train_pred.flatten()  # Close price is at index 3
-        dummy_test[:, 3] = test_pred.flatten()
+        # Int8 weights for serving with USE_INT8=1
+        quantize_dynamic(f"{model_dir}/model.onnx", f"{model_dir}/model.int8.onnx", weight_type=QuantType.QInt8)
         
-        dummy_train_actual = np.zeros((len(y_train), len(self.scaler.scale_)))
-        dummy_test_actual = np.zeros((len(y_test), len(self.scaler.scale_)))
+        # Evaluate the exported float32 model the API serves (training ran in
+        # mixed precision, so the Keras model's own predictions differ slightly)
+        train_pred = self.onnx_predict(f"{model_dir}/model.onnx", X_train)
+        test_pred = self.onnx_predict(f"{model_dir}/model.onnx", X_test)
+        int8_test_pred = self.onnx_predict(f"{model_dir}/model.int8.onnx", X_test)
         
-        dummy_train_actual[:, 3] = y_train
-        dummy_test_actual[:, 3] = y_test
+        # Inverse transform predictions (only for Close price column)
+        close_scale, close_offset = close_inverse_transform(self.scaler)
         
-        train_pred_actual = self.scaler.inverse_transform(dummy_train)[:, 3]
-        test_pred_actual = self.scaler.inverse_transform(dummy_test)[:, 3]
+        train_pred_actual = train_pred * close_scale + close_offset
+        test_pred_actual = test_pred * close_scale + close_offset
+        int8_test_pred_actual = int8_test_pred * close_scale + close_offset
         
-        train_actual = self.scaler.inverse_transform(dummy_train_actual)[:, 3]
-        test_actual = self.scaler.inverse_transform(dummy_test_actual)[:, 3]
+        train_actual = y_train * close_scale + close_offset
+        test_actual = y_test * close_scale + close_offset
         
         # Calculate metrics
         train_rmse = np.sqrt(mean_squared_error(train_actual, train_pred_actual))
         test_rmse = np.sqrt(mean_squared_error(test_actual, test_pred_actual))
         train_mae = mean_absolute_error(train_actual, train_pred_actual)
         test_mae = mean_absolute_error(test_actual, test_pred_actual)
+        int8_test_rmse = np.sqrt(mean_squared_error(test_actual, int8_test_pred_actual))
         
         print(f"\n📊 Model Performance for {symbol}:")
         print(f"Train RMSE: ${train_rmse:.2f}")
         print(f"Test RMSE: ${test_rmse:.2f}")
         print(f"Train MAE: ${train_mae:.2f}")
         print(f"Test MAE: ${test_mae:.2f}")
-        
-        # Save model and scaler
-        model_dir = f"models/{symbol.replace('-', '_')}"
-        os.makedirs(model_dir, exist_ok=True)
-        
-        model.save(f"{model_dir}/model.h5")
-        joblib.dump(self.scaler, f"{model_dir}/scaler.pkl")
+        print(f"Int8 Test RMSE: ${int8_test_rmse:.2f} ({int8_test_rmse - test_rmse:+.2f})")
         
         # Save model metadata
         metadata = {
@@ -200,6 +207,8 @@ class CryptoPredictionModel:
             'test_rmse': float(test_rmse),
             'train_mae': float(train_mae),
             'test_mae': float(test_mae),
+            'int8_test_rmse': float(int8_test_rmse),
+            'int8_rmse_delta': float(int8_test_rmse - test_rmse),
             'training_date': datetime.now().isoformat(),
             'data_shape': data_with_features.shape
         }
@@ -220,7 +229,7 @@ class CryptoPredictionModel:
         model_dir = f"models/{symbol.replace('-', '_')}"
         
         try:
-            model = tf.keras.models.load_model(f"{model_dir}/model.h5")
+            model = tf.keras.models.load_model(f"{model_dir}/saved_model")
             scaler = joblib.load(f"{model_dir}/scaler.pkl")
         except:
             print(f"No trained model found for {symbol}. Please train first.")
@@ -230,42 +239,26 @@ class CryptoPredictionModel:
         data = self.fetch_crypto_data(symbol, period="1y")
         data_with_features = self.prepare_features(data)
         
-        # Get last sequence
-        feature_columns = ['Open', 'High', 'Low', 'Close', 'Volume', 
-                          'MA_7', 'MA_21', 'MA_50', 'RSI', 'BB_position', 
-                          'Volatility', 'Volume_ratio', 'Price_change', 'High_low_ratio']
-        
-        scaled_data = scaler.transform(data_with_features[feature_columns])
-        last_sequence = scaled_data[-self.sequence_length:].reshape(1, self.sequence_length, -1)
+        # Get last sequence (indicators need the full history; only the tail is scaled)
+        features = data_with_features[self.feature_columns].iloc[-self.sequence_length:].to_numpy(dtype=np.float32)
+        last_sequence = scaler.transform(features).reshape(1, self.sequence_length, -1)
         
-        # Predict next days
-        predictions = []
-        current_sequence = last_sequence.copy()
-        
-        for _ in range(days):
-            pred = model.predict(current_sequence, verbose=0)
-            predictions.append(pred[0, 0])
-            
-            # Update sequence (simplified - in reality, you'd need to update all features)
-            new_row = current_sequence[0, -1, :].copy()
-            new_row[3] = pred[0, 0]  # Update close price
-            
-            current_sequence = np.roll(current_sequence, -1, axis=1)
-            current_sequence[0, -1, :] = new_row
+        # Predict next days in a single compiled call
+        roll_predict = make_roll_predict(
+            lambda x: model(x, training=False), days, self.sequence_length
+        )
+        predictions = roll_predict(tf.constant(last_sequence, dtype=tf.float32)).numpy()
         
         # Inverse transform predictions
-        dummy_pred = np.zeros((len(predictions), len(scaler.scale_)))
-        for i, pred in enumerate(predictions):
-            dummy_pred[i, 3] = pred
-        
-        actual_predictions = scaler.inverse_transform(dummy_pred)[:, 3]
+        close_scale, close_offset = close_inverse_transform(scaler)
+        actual_predictions = predictions.astype(np.float64) * close_scale + close_offset
         
         # Create prediction dates
         last_date = data_with_features.index[-1]
-        pred_dates = [last_date + timedelta(days=i+1) for i in range(days)]
+        pred_dates = pd.date_range(last_date + pd.Timedelta(days=1), periods=days, freq='D')
         
         return {
-            'dates': pred_dates,
+            'dates': pred_dates.tolist(),
             'predictions': actual_predictions.tolist(),
             'current_price': float(data_with_features['Close'].iloc[-1])
         }